@@ -2,10 +2,11 @@
 
 from __future__ import annotations
 
-from .common import Metadata, ProtocolError, SSLArgument
+from .common import ChunkSize, Metadata, ProtocolError, SSLArgument
 from .retry import RetryConfiguration, metadata, upload, upload_multiple
 
 __all__ = (
+    "ChunkSize",
     "Metadata",
     "ProtocolError",
     "RetryConfiguration",
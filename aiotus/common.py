@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
+import io
+import os
 import ssl
-from collections.abc import Mapping
-from typing import Final, Optional, Union
+import stat
+import threading
+from collections.abc import AsyncIterator, Mapping
+from typing import BinaryIO, Final, Literal, Optional, Union, cast
 
 import aiohttp
+import multidict
 
 # The version of the tus protocol we implement.
 TUS_PROTOCOL_VERSION: Final = "1.0.0"
@@ -15,6 +21,195 @@ SSLArgument = Union[bool, ssl.SSLContext, aiohttp.Fingerprint]
 
 Metadata = Mapping[str, Optional[bytes]]
 
+ChunkSize = Union[int, Literal["auto"]]
+
+# Size of values (in bytes when encoding, in characters when decoding) from
+# which on pybase64 is used for base64 encoding and decoding, if it is
+# installed. For shorter values the overhead of the call dominates.
+PYBASE64_MIN_SIZE: Final = 256
+
+# Size of the blocks in which data is read from a buffer while it is
+# streamed to the server.
+_READ_BLOCKSIZE: Final = 1024 * 1024
+
 
 class ProtocolError(Exception):
     """Server response did not follow the tus protocol."""
+
+
+def check_chunksize(chunksize: ChunkSize) -> None:
+    """Check that the chunksize can be used for uploading data.
+
+    Raises a 'ValueError' if it is not positive (no data would be uploaded
+    with it), or if it is a string other than "auto".
+    """
+    if isinstance(chunksize, str):
+        if chunksize != "auto":
+            raise ValueError(f'Invalid chunksize "{chunksize}".')
+    elif chunksize <= 0:
+        raise ValueError("The chunksize must be positive.")
+
+
+def is_plain_file(buffer: BinaryIO) -> bool:
+    """Check if the buffer reads the bytes of its file descriptor unchanged.
+
+    Only then the descriptor can be used directly. Wrappers like
+    'gzip.GzipFile' return the descriptor of the (compressed) file below
+    them, and buffered writers may hold data not yet written to the file.
+    """
+    return type(buffer) in (io.BufferedReader, io.FileIO)
+
+
+async def buffer_size(buffer: BinaryIO) -> int:
+    """Determine the number of bytes in a buffer.
+
+    The size of in-memory buffers and plain regular files is determined
+    directly, other buffers are seeked to their end in a thread.
+    """
+    if isinstance(buffer, io.BytesIO):
+        with buffer.getbuffer() as view:
+            return view.nbytes
+
+    if is_plain_file(buffer):
+        try:
+            status = os.fstat(buffer.fileno())
+            if stat.S_ISREG(status.st_mode):
+                return status.st_size
+        except (OSError, ValueError):
+            pass
+
+    return await asyncio.to_thread(buffer.seek, 0, io.SEEK_END)
+
+
+def parse_positive_integer_header(
+    headers: multidict.CIMultiDictProxy[str], header_name: str
+) -> int:
+    """Convert a HTTP header into a positive integer value.
+
+    Raises a ProtocolError if the conversion is not posible.
+    """
+    if header_name not in headers:
+        raise ProtocolError(
+            f'HTTP header "{header_name}" not included in server response.'
+        )
+
+    header_value = headers[header_name]
+
+    # Only plain ASCII digits are accepted, which also rules out signs,
+    # whitespace and underscores that 'int()' would tolerate.
+    if header_value.isascii() and header_value.isdigit():
+        return int(header_value)
+
+    raise ProtocolError(
+        f'Unable to convert "{header_name}" header '
+        f'"{header_value}" to a positive integer.'
+    )
+
+
+class BufferReader:
+    """Stream ranges of a buffer without reading them completely into memory."""
+
+    def __init__(self, buffer: BinaryIO) -> None:
+        """Create a reader that streams the data of the buffer."""
+        self._buffer = buffer
+
+        # The position in the buffer where we currently read from.
+        self._position = -1
+
+        # The file descriptor to read from, if the buffer is a regular file
+        # and positional reads are supported by the platform.
+        self._fd: Optional[int] = None
+        if hasattr(os, "pread") and is_plain_file(buffer):
+            try:
+                fd = buffer.fileno()
+                if stat.S_ISREG(os.fstat(fd).st_mode):
+                    self._fd = fd
+            except (OSError, ValueError):
+                pass
+
+        # Blocks of in-memory buffers are copied out of the buffer directly,
+        # reading them does not block. (Subclasses may override 'read()'.)
+        self._in_memory = type(buffer) is io.BytesIO
+
+        # Serializes reads of the buffer, a read that was started for an aborted
+        # request may still be running in the executor.
+        self._lock = threading.Lock()
+
+        # The exception raised while reading from the buffer, if any.
+        #
+        # aiohttp wraps exceptions raised while sending the request body into
+        # connection errors, this is used to tell them apart from real
+        # communication problems.
+        self.error: Optional[Exception] = None
+
+    def _read(self, offset: int, size: int) -> bytes:
+        """Read up to 'size' bytes from the buffer, starting at 'offset'.
+
+        Except for in-memory buffers, this is a blocking function that is run
+        in the executor.
+        """
+        if self._in_memory:
+            with cast(io.BytesIO, self._buffer).getbuffer() as view:
+                return bytes(view[offset : offset + size])
+
+        if self._fd is not None:
+            # Positional reads need no separate seek, and leave the position
+            # of the file object untouched.
+            return os.pread(self._fd, size, offset)
+
+        with self._lock:
+            # The position is unknown if seeking or reading fails.
+            position, self._position = self._position, -1
+
+            if position != offset:
+                # Seek to the offset that the server expects next.
+                self._buffer.seek(offset, io.SEEK_SET)
+
+            block = self._buffer.read(size)
+            self._position = offset + len(block)
+
+            return block
+
+    async def stream(self, offset: int, size: int) -> AsyncIterator[bytes]:
+        """Yield 'size' bytes from the buffer, starting at 'offset'.
+
+        The next block is already read while the current one is sent.
+        """
+        loop = asyncio.get_running_loop()
+
+        def read_next() -> asyncio.Future[bytes]:
+            if self._in_memory:
+                future = loop.create_future()
+                try:
+                    future.set_result(self._read(offset, min(size, _READ_BLOCKSIZE)))
+                except Exception as e:
+                    future.set_exception(e)
+
+                return future
+
+            return loop.run_in_executor(
+                None, self._read, offset, min(size, _READ_BLOCKSIZE)
+            )
+
+        pending = read_next()
+        try:
+            while size > 0:
+                if not (block := await pending):
+                    # If the checks in 'upload_buffer()' are correct, we should
+                    # never get here.
+                    raise RuntimeError("Buffer returned unexpected EOF.")
+
+                offset += len(block)
+                size -= len(block)
+
+                if size > 0:
+                    pending = read_next()
+
+                yield block
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            # Do not wait for a block that is not needed anymore because the
+            # request was aborted.
+            pending.cancel()
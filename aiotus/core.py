@@ -7,22 +7,55 @@ defines how the data upload is handled.
 
 from __future__ import annotations
 
-import asyncio
-import base64
+import binascii
 import dataclasses
-import io
+import re
+import sys
+import time
 from collections.abc import Mapping
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Final, Optional
 
 import aiohttp
 import multidict
 import yarl
+from aiohttp import hdrs
+
+try:
+    # Use the SIMD accelerated implementation, if it is installed.
+    import pybase64
+except ImportError:
+    pybase64 = None
 
 from . import common
 from .log import logger
 
+# Limits of the chunksize when it is adapted to the measured throughput
+# (chunksize "auto"), and the duration that each request should take.
+MIN_AUTO_CHUNKSIZE: Final = 256 * 1024
+MAX_AUTO_CHUNKSIZE: Final = 64 * 1024 * 1024
+_AUTO_CHUNK_SECONDS: Final = 2.0
+
+# An element of a comma-separated list in a header (e.g. "Tus-Extension").
+_TOKEN_RE: Final = re.compile(r"[^,\s]+")
+
+# Pre-folded name of the header that is set for every chunk, like the
+# constants in 'aiohttp.hdrs'.
+_UPLOAD_OFFSET: Final = multidict.istr("Upload-Offset")
+
+# Headers of requests for which the caller did not pass additional headers.
+_TUS_HEADERS: Final = multidict.CIMultiDictProxy(
+    multidict.CIMultiDict({"Tus-Resumable": common.TUS_PROTOCOL_VERSION})
+)
+
+# A key and its optional value in the "Upload-Metadata" header, followed
+# by the comma that separates it from the next pair (or the end of the header).
+_METADATA_PAIR_RE: Final = re.compile(r"\s*([^\s,]+)(?:\s+([^\s,]+))?\s*(?:,(?!\Z)|\Z)")
 
-@dataclasses.dataclass
+# A base64 encoded value, using the standard alphabet with padding.
+_BASE64_RE: Final = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+
+@dataclasses.dataclass(slots=True)
 class ServerConfiguration:
     """Class to hold the server's configuration."""
 
@@ -43,30 +76,15 @@ class ServerConfiguration:
     """
 
 
-def _parse_positive_integer_header(
-    headers: multidict.CIMultiDictProxy[str], header_name: str
-) -> int:
-    """Convert a HTTP header into a positive integer value.
-
-    Raises a ProtocolError if the conversion is not posible.
-    """
-    if header_name not in headers:
-        raise common.ProtocolError(
-            f'HTTP header "{header_name}" not included in server response.'
-        )
-
-    header_value = headers[header_name]
+def _tus_headers(headers: Optional[Mapping[str, str]]) -> Mapping[str, str]:
+    """Add the "Tus-Resumable" header to the optional request headers."""
+    if not headers:
+        return _TUS_HEADERS
 
-    try:
-        if (result := int(header_value)) < 0:
-            raise RuntimeError()
+    tus_headers = multidict.CIMultiDict(headers)
+    tus_headers["Tus-Resumable"] = common.TUS_PROTOCOL_VERSION
 
-        return result
-    except Exception:
-        raise common.ProtocolError(
-            f'Unable to convert "{header_name}" header '
-            f'"{header_value}" to a positive integer.'
-        )
+    return tus_headers
 
 
 async def offset(
@@ -83,14 +101,28 @@ async def offset(
     :param headers: Optional headers used in the request.
     :return: The number of bytes that are already on the server.
     """
-    tus_headers = dict(headers or {})
-    tus_headers["Tus-Resumable"] = common.TUS_PROTOCOL_VERSION
+    tus_headers = _tus_headers(headers)
 
-    logger.debug(f'Getting offset of "{location}"...')
+    logger.debug('Getting offset of "%s"...', location)
     async with await session.head(location, headers=tus_headers, ssl=ssl) as response:
         response.raise_for_status()
 
-        return _parse_positive_integer_header(response.headers, "Upload-Offset")
+        return common.parse_positive_integer_header(response.headers, "Upload-Offset")
+
+
+def _decode_base64(value: str) -> bytes:
+    """Decode a base64 string, rejecting characters not in the alphabet."""
+    if (pybase64 is not None) and (len(value) >= common.PYBASE64_MIN_SIZE):
+        decoded: bytes = pybase64.b64decode(value, validate=True)
+        return decoded
+
+    if sys.version_info >= (3, 11):
+        return binascii.a2b_base64(value, strict_mode=True)
+
+    if not _BASE64_RE.fullmatch(value):
+        raise binascii.Error("Non-base64 digit found")
+
+    return binascii.a2b_base64(value)
 
 
 def _parse_metadata(header: str) -> common.Metadata:
@@ -99,15 +131,16 @@ def _parse_metadata(header: str) -> common.Metadata:
         return {}
 
     md: dict[str, Optional[bytes]] = {}
-    for pair in header.split(","):
-        kv = pair.split()
-        if len(kv) == 1:
-            md[kv[0]] = None
-        elif len(kv) == 2:
-            md[kv[0]] = base64.b64decode(kv[1], validate=True)
-        else:
+    position = 0
+    while position < len(header):
+        if not (match := _METADATA_PAIR_RE.match(header, position)):
             raise ValueError("Key/Value pair consists of more than two elements.")
 
+        key, value = match.groups()
+        md[key] = None if value is None else _decode_base64(value)
+
+        position = match.end()
+
     return md
 
 
@@ -129,10 +162,9 @@ async def metadata(
     :return: The metadata of the upload.
     :raises common.ProtocolError: When the server does not comply to the tus protocol.
     """
-    tus_headers = dict(headers or {})
-    tus_headers["Tus-Resumable"] = common.TUS_PROTOCOL_VERSION
+    tus_headers = _tus_headers(headers)
 
-    logger.debug(f'Getting metadata of "{location}"...')
+    logger.debug('Getting metadata of "%s"...', location)
     async with await session.head(location, headers=tus_headers, ssl=ssl) as response:
         response.raise_for_status()
 
@@ -145,40 +177,74 @@ async def metadata(
             raise common.ProtocolError(f"Unable to parse metadata: {e}")
 
 
+def _adapt_chunksize(size: int, elapsed: float) -> int:
+    """Compute the size of the next chunk from the throughput of the last one."""
+    if elapsed <= 0:
+        return MAX_AUTO_CHUNKSIZE
+
+    chunksize = int(size / elapsed * _AUTO_CHUNK_SECONDS)
+    return max(MIN_AUTO_CHUNKSIZE, min(MAX_AUTO_CHUNKSIZE, chunksize))
+
+
 async def upload_buffer(
     session: aiohttp.ClientSession,
     location: yarl.URL,
     buffer: BinaryIO,
     ssl: common.SSLArgument = True,
-    chunksize: int = 4 * 1024 * 1024,
+    chunksize: common.ChunkSize = 4 * 1024 * 1024,
     headers: Optional[Mapping[str, str]] = None,
+    initial_offset: Optional[int] = None,
 ) -> None:
     """Upload data to the server.
 
+    The data of each chunk is streamed from the buffer while it is sent
+    to the server, so the chunksize does not affect the memory usage.
+
+    If the chunksize is "auto", it is adapted after each chunk to the
+    measured throughput, so that uploading a chunk takes about two seconds.
+
     :param session: HTTP session to use for connections.
     :param location: The endpoint to upload to.
     :param buffer: The data to upload.
     :param ssl: SSL validation mode, passed on to aiohttp.
-    :param chunksize: The size of individual chunks to upload at a time.
+    :param chunksize: The (positive) size of individual chunks to upload at
+        a time, or "auto" to adapt it to the throughput.
     :param headers: Optional headers used in the request.
+    :param initial_offset: The number of bytes the server already has for the
+        upload, if known. Otherwise, the offset is queried from the server.
+    :raises aiohttp.ClientError: When the communication with the server fails.
     :raises common.ProtocolError: When the server does not comply to the tus protocol.
     :raises RuntimeError: When reading of the file fails.
     """
-    loop = asyncio.get_event_loop()
+    common.check_chunksize(chunksize)
 
-    total_size = await loop.run_in_executor(None, buffer.seek, 0, io.SEEK_END)
+    total_size = await common.buffer_size(buffer)
 
-    # The position in the file where we currently read from.
-    current_read_offset = -1
+    reader = common.BufferReader(buffer)
 
-    # We ask the server for the number of bytes it already has for the upload. This
-    # makes it possible to use this function also for resuming aborted uploads.
-    current_server_offset = await offset(session, location, ssl=ssl, headers=headers)
+    if initial_offset is not None:
+        current_server_offset = initial_offset
+    else:
+        # We ask the server for the number of bytes it already has for the upload.
+        # This makes it possible to use this function also for resuming aborted
+        # uploads.
+        current_server_offset = await offset(
+            session, location, ssl=ssl, headers=headers
+        )
 
     logger.debug(
-        f'Resuming upload of "{location}" at offset {current_server_offset}..."'
+        'Resuming upload of "%s" at offset %d...', location, current_server_offset
     )
 
+    tus_headers = multidict.CIMultiDict(_tus_headers(headers))
+    tus_headers[hdrs.CONTENT_TYPE] = "application/offset+octet-stream"
+
+    if chunksize == "auto":
+        auto_chunksize = True
+        chunksize = MIN_AUTO_CHUNKSIZE
+    else:
+        auto_chunksize = False
+
     while True:
         if current_server_offset == total_size:
             # Done, the whole file is on the server.
@@ -189,40 +255,39 @@ async def upload_buffer(
             # The offset that the server expects next does not exist.
             raise common.ProtocolError("Server offset too big.")
 
-        if current_read_offset != current_server_offset:
-            # Seek to the offset that the server expects next.
-            current_read_offset = current_server_offset
-            await loop.run_in_executor(
-                None, buffer.seek, current_read_offset, io.SEEK_SET
-            )
-
-        if not (chunk := await loop.run_in_executor(None, buffer.read, chunksize)):
-            # If the checks above are correct, we should never get here.
-            raise RuntimeError("Buffer returned unexpected EOF.")
+        size = min(chunksize, total_size - current_server_offset)
 
-        current_read_offset += len(chunk)
-
-        tus_headers = dict(headers or {})
-        tus_headers.update(
-            {
-                "Tus-Resumable": common.TUS_PROTOCOL_VERSION,
-                "Upload-Offset": str(current_server_offset),
-                "Content-Length": str(len(chunk)),
-                "Content-Type": "application/offset+octet-stream",
-            }
-        )
+        # aiohttp copies the headers when the request is made, so they can be
+        # changed for the next chunk.
+        tus_headers[_UPLOAD_OFFSET] = str(current_server_offset)
+        tus_headers[hdrs.CONTENT_LENGTH] = str(size)
 
-        logger.debug(f'Uploading {len(chunk)} bytes to "{location}"...')
-        async with await session.patch(
-            location, headers=tus_headers, data=chunk, ssl=ssl
-        ) as response:
-            response.raise_for_status()
-
-            # Safe the value of the current offset on the server-side, at the beginning
-            # of this loop are checks to see if it is valid.
-            current_server_offset = _parse_positive_integer_header(
-                response.headers, "Upload-Offset"
-            )
+        logger.debug('Uploading %d bytes to "%s"...', size, location)
+        start = time.monotonic()
+        try:
+            async with await session.patch(
+                location,
+                headers=tus_headers,
+                data=reader.stream(current_server_offset, size),
+                ssl=ssl,
+            ) as response:
+                response.raise_for_status()
+
+                # Safe the value of the current offset on the server-side, at the
+                # beginning of this loop are checks to see if it is valid.
+                current_server_offset = common.parse_positive_integer_header(
+                    response.headers, "Upload-Offset"
+                )
+        except aiohttp.ClientError:
+            if reader.error is None:
+                raise
+
+            raise RuntimeError(
+                f"Unable to read buffer: {reader.error}"
+            ) from reader.error
+
+        if auto_chunksize:
+            chunksize = _adapt_chunksize(size, time.monotonic() - start)
 
 
 async def configuration(
@@ -247,16 +312,16 @@ async def configuration(
         if "Tus-Version" not in response.headers:
             raise common.ProtocolError('"Tus-Version" header not present.')
 
-        versions = response.headers["Tus-Version"].split(",")
-        versions = [v.strip() for v in versions]
+        versions = _TOKEN_RE.findall(response.headers["Tus-Version"])
 
         max_size = None
         if "Tus-Max-Size" in response.headers:
-            max_size = _parse_positive_integer_header(response.headers, "Tus-Max-Size")
+            max_size = common.parse_positive_integer_header(
+                response.headers, "Tus-Max-Size"
+            )
 
         extensions = []
         if "Tus-Extension" in response.headers:
-            extensions = response.headers["Tus-Extension"].split(",")
-            extensions = [e.strip() for e in extensions]
+            extensions = _TOKEN_RE.findall(response.headers["Tus-Extension"])
 
         return ServerConfiguration(versions, max_size, extensions)
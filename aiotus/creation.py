@@ -7,14 +7,19 @@ defines how to reserve space on the server for uploading data to.
 
 from __future__ import annotations
 
-import asyncio
 import base64
-import io
 from collections.abc import Mapping
 from typing import BinaryIO, Optional
 
 import aiohttp
 import yarl
+from aiohttp import hdrs
+
+try:
+    # Use the SIMD accelerated implementation, if it is installed.
+    import pybase64
+except ImportError:
+    pybase64 = None
 
 from . import common
 from .log import logger
@@ -36,6 +41,16 @@ def _check_metadata_keys(metadata: common.Metadata) -> None:
             raise ValueError("Metadata keys must not contain commas.")
 
 
+def _encode_base64(value: bytes) -> str:
+    """Encode a metadata value with base64."""
+    if (pybase64 is not None) and (len(value) >= common.PYBASE64_MIN_SIZE):
+        encoded: bytes = pybase64.b64encode(value)
+    else:
+        encoded = base64.b64encode(value)
+
+    return encoded.decode()
+
+
 def encode_metadata(metadata: common.Metadata) -> str:
     """Encode the metadata to the value of the metadata header.
 
@@ -44,16 +59,42 @@ def encode_metadata(metadata: common.Metadata) -> str:
     """
     _check_metadata_keys(metadata)
 
-    def encode_value(value: Optional[bytes]) -> str:
-        if value is None:
-            return ""
+    pairs: list[str] = [
+        k if v is None else f"{k} {_encode_base64(v)}" for k, v in metadata.items()
+    ]
+    return ",".join(pairs)
 
-        encoded_bytes = base64.b64encode(value)
-        encoded_string = encoded_bytes.decode()
-        return " " + encoded_string
 
-    pairs = [f"{k}{encode_value(v)}" for k, v in metadata.items()]
-    return ",".join(pairs)
+def _creation_headers(
+    total_size: Optional[int],
+    metadata: common.Metadata,
+    headers: Optional[Mapping[str, str]],
+) -> dict[str, str]:
+    """Build the headers of a request that creates an upload."""
+    tus_headers = dict(headers or {})
+    tus_headers["Tus-Resumable"] = common.TUS_PROTOCOL_VERSION
+
+    if total_size is not None:
+        tus_headers["Upload-Length"] = str(total_size)
+
+    if metadata_header := encode_metadata(metadata):
+        tus_headers["Upload-Metadata"] = metadata_header
+
+    return tus_headers
+
+
+def _creation_error(response: aiohttp.ClientResponse) -> Optional[str]:
+    """Check the response to a request that created an upload.
+
+    Returns a description of the problem if it does not follow the protocol.
+    """
+    if response.status != 201:
+        return f"Wrong status code {response.status}, expected 201."
+
+    if "Location" not in response.headers:
+        return 'Upload created, but no "Location" header in response.'
+
+    return None
 
 
 async def create(
@@ -77,28 +118,80 @@ async def create(
     :return: The URL to upload the data to.
     :raises common.ProtocolError: When the server does not comply to the tus protocol.
     """
-    tus_headers = dict(headers or {})
-    tus_headers["Tus-Resumable"] = common.TUS_PROTOCOL_VERSION
-
-    if file is not None:
-        loop = asyncio.get_event_loop()
-        total_size = await loop.run_in_executor(None, file.seek, 0, io.SEEK_END)
-        tus_headers["Upload-Length"] = str(total_size)
-
-    if metadata_header := encode_metadata(metadata):
-        tus_headers["Upload-Metadata"] = metadata_header
+    total_size = None if file is None else await common.buffer_size(file)
+    tus_headers = _creation_headers(total_size, metadata, headers)
 
     logger.debug("Creating upload...")
     async with await session.post(url, headers=tus_headers, ssl=ssl) as response:
         response.raise_for_status()
-        if response.status != 201:
-            raise common.ProtocolError(
-                f"Wrong status code {response.status}, expected 201."
-            )
+        if (error := _creation_error(response)) is not None:
+            raise common.ProtocolError(error)
+
+        return yarl.URL(response.headers["Location"])
+
+
+async def create_with_upload(
+    session: aiohttp.ClientSession,
+    url: yarl.URL,
+    file: BinaryIO,
+    metadata: common.Metadata,
+    ssl: common.SSLArgument = True,
+    headers: Optional[Mapping[str, str]] = None,
+    chunksize: int = 4 * 1024 * 1024,
+) -> tuple[yarl.URL, Optional[int]]:
+    """Create an upload, and send the first chunk of the data along with it.
+
+    This requires the server to support the
+    `creation-with-upload extension
+    <https://tus.io/protocols/resumable-upload.html#creation-with-upload>`_,
+    it saves the round-trip of a separate request for the first chunk.
 
-        if "Location" not in response.headers:
-            raise common.ProtocolError(
-                'Upload created, but no "Location" header in response.'
+    :param session: HTTP session to use for connections.
+    :param url: The creation endpoint of the server.
+    :param file: The file object to upload.
+    :param metadata: Additional metadata for the upload.
+    :param ssl: SSL validation mode, passed on to aiohttp.
+    :param headers: Optional headers used in the request.
+    :param chunksize: The maximum (positive) number of bytes to send with the
+        request.
+    :return: The URL to upload the remaining data to, and the offset of the
+        upload reported by the server (or None if the server did not report it).
+    :raises aiohttp.ClientError: When the communication with the server fails.
+    :raises common.ProtocolError: When the server does not comply to the tus protocol.
+    :raises RuntimeError: When reading of the file fails.
+    """
+    common.check_chunksize(chunksize)
+
+    total_size = await common.buffer_size(file)
+    size = min(chunksize, total_size)
+
+    tus_headers = _creation_headers(total_size, metadata, headers)
+    tus_headers[hdrs.CONTENT_TYPE] = "application/offset+octet-stream"
+    tus_headers[hdrs.CONTENT_LENGTH] = str(size)
+
+    reader = common.BufferReader(file)
+
+    logger.debug("Creating upload with %d bytes of data...", size)
+    try:
+        async with await session.post(
+            url, headers=tus_headers, data=reader.stream(0, size), ssl=ssl
+        ) as response:
+            response.raise_for_status()
+            if (error := _creation_error(response)) is not None:
+                raise common.ProtocolError(error)
+
+            location = yarl.URL(response.headers["Location"])
+
+            # The offset is optional in the response, the caller has to ask
+            # for it if it is missing.
+            if "Upload-Offset" not in response.headers:
+                return location, None
+
+            return location, common.parse_positive_integer_header(
+                response.headers, "Upload-Offset"
             )
+    except aiohttp.ClientError:
+        if reader.error is None:
+            raise
 
-        return yarl.URL(response.headers["Location"])
+        raise RuntimeError(f"Unable to read buffer: {reader.error}") from reader.error
@@ -8,33 +8,67 @@ import logging
 import mimetypes
 import os.path
 import sys
+from collections.abc import Coroutine
+from typing import Any, Optional, TypeVar
+
+import yarl
+
+try:
+    # Use the faster event loop implementation, if it is installed.
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from . import retry
 
+T = TypeVar("T")
 
-def _upload(args: argparse.Namespace) -> int:
-    """Implement the "upload" command.
 
-    Returns the exit status for the program.
+def _run(coro: Coroutine[Any, Any, T]) -> T:
+    """Run the coroutine in a new event loop (provided by uvloop, if available)."""
+    if uvloop is not None:
+        return uvloop.run(coro)  # type: ignore
+
+    return asyncio.run(coro)
+
+
+async def _upload_file(args: argparse.Namespace) -> Optional[yarl.URL]:
+    """Upload the file given on the command line.
+
+    The MIME type is guessed (which may load the MIME databases from disk)
+    and the file is opened in threads, so they don't block the event loop.
     """
-    metadata = {"filename": os.path.basename(args.file).encode()}
+    (mime_type, _), file = await asyncio.gather(
+        asyncio.to_thread(mimetypes.guess_type, args.file),
+        asyncio.to_thread(open, args.file, "rb"),
+    )
+
+    with file:
+        metadata = {"filename": os.path.basename(args.file).encode()}
+
+        if mime_type:
+            metadata["mime_type"] = mime_type.encode()
 
-    if mime_type := mimetypes.guess_type(args.file)[0]:
-        metadata["mime_type"] = mime_type.encode()
+        for meta in args.metadata:
+            kv = meta.split("=", maxsplit=1)
+            metadata[kv[0]] = kv[1].encode() if (len(kv) == 2) else None
 
-    for meta in args.metadata:
-        kv = meta.split("=", maxsplit=1)
-        metadata[kv[0]] = kv[1].encode() if (len(kv) == 2) else None
+        return await retry.upload(args.endpoint, file, metadata)
 
+
+def _upload(args: argparse.Namespace) -> int:
+    """Implement the "upload" command.
+
+    Returns the exit status for the program.
+    """
     try:
-        with open(args.file, "rb") as file:
-            if location := asyncio.run(retry.upload(args.endpoint, file, metadata)):
-                print(str(location))
-                return 0
+        if location := _run(_upload_file(args)):
+            print(str(location))
+            return 0
     except KeyboardInterrupt:  # pragma: no cover
         pass
     except Exception as e:
-        logging.error(f"Unable to upload file: {e}")
+        logging.error("Unable to upload file: %s", e)
 
     return 1
 
@@ -45,16 +79,16 @@ def _metadata(args: argparse.Namespace) -> int:
     Returns the exit status for the program.
     """
     try:
-        metadata = asyncio.run(retry.metadata(args.location))
-        # Silence mypy, it does not detect the type 'asyncio.run()' returns.
+        metadata = _run(retry.metadata(args.location))
+        # Silence mypy, it does not detect the type '_run()' returns.
         assert isinstance(metadata, dict)  # nosec B101
 
-        for k, v in metadata.items():
-            if v is None:
-                print(f"{k}")
-            else:
-                value = repr(v)[2:][:-1]
-                print(f"{k}: {value}")
+        # The values are printed like bytes literals (without the b'' around
+        # them), so that non-printable bytes and line breaks are escaped.
+        sys.stdout.writelines(
+            f"{k}\n" if v is None else f"{k}: {repr(v)[2:-1]}\n"
+            for k, v in metadata.items()
+        )
 
         return 0
     except KeyboardInterrupt:  # pragma: no cover
@@ -4,17 +4,15 @@ from __future__ import annotations
 
 import asyncio
 import dataclasses
-import sys
-from collections.abc import Iterable, Mapping
-from types import TracebackType
-from typing import (
-    AsyncContextManager,
-    BinaryIO,
-    Callable,
-    Optional,
-    TypeVar,
-    Union,
-)
+import functools
+import io
+import logging
+import math
+import threading
+import weakref
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import nullcontext
+from typing import AsyncContextManager, BinaryIO, Final, Optional, Union, cast
 
 import aiohttp
 import tenacity
@@ -23,32 +21,8 @@ import yarl
 from . import common, core, creation
 from .log import logger
 
-T = TypeVar("T")
-
-if sys.version_info >= (3, 10):
-    # 'contextlib.nullcontext' supports async beginning with Python 3.10.
-    from contextlib import nullcontext as asyncnullcontext
-else:
-
-    class asyncnullcontext(AsyncContextManager[T]):  # noqa: N801
-        """Asynchronous version of 'contextlib.nullcontext'."""
-
-        def __init__(self, aenter_result: T) -> None:  # noqa: D107
-            self._aenter_result = aenter_result
-
-        async def __aenter__(self) -> T:  # noqa: D105
-            return self._aenter_result
 
-        async def __aexit__(  # noqa: D105
-            self,
-            exc_type: Optional[type[BaseException]],
-            exc_value: Optional[BaseException],
-            traceback: Optional[TracebackType],
-        ) -> None:
-            return None
-
-
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class RetryConfiguration:
     """Class to hold settings for the functions of this module."""
 
@@ -61,7 +35,8 @@ class RetryConfiguration:
     """
     Maximum time between retries, in seconds.
 
-    Exponential backoff is used in case of communication errors,
+    Exponential backoff (with random jitter, so that parallel uploads don't
+    all retry at the same time) is used in case of communication errors,
     but the time between retries is caped by this value.
     """
 
@@ -75,25 +50,51 @@ class RetryConfiguration:
     for the different meanings.
     """  # noqa: E501
 
+    creation_with_upload: bool = False
+    """
+    Send the first chunk of data already with the request that creates an upload.
+
+    This saves a round-trip per upload, but requires the server to support the
+    "creation-with-upload" extension.
+    """
 
-def _make_log_before_function(s: str) -> Callable[[tenacity.RetryCallState], None]:
-    """Create a function used to log before a retry attempt."""
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=30, sock_read=60
+    )
+    """
+    Timeouts of the requests done by the sessions that aiotus creates itself.
+
+    By default there is no limit for the total duration of a request (the
+    aiohttp default of five minutes can be too short to upload a large chunk
+    over a slow connection), but a server that stops sending or receiving
+    data is detected. Sessions passed in by the caller keep their own timeouts.
+    """
 
-    def log(retry_state: tenacity.RetryCallState) -> None:
-        if retry_state.attempt_number > 1:
-            logger.info(
-                f"Trying {s} again, attempt number {retry_state.attempt_number}..."
-            )
 
-    return log
+class _RetryLogger:
+    """Provides the functions used by tenacity to log retries of an operation."""
 
+    __slots__ = ("_s", "_s_capitalized")
 
-def _make_log_before_sleep_function(
-    s: str,
-) -> Callable[[tenacity.RetryCallState], None]:
-    """Create a function used when a call made through tenacity fails."""
+    def __init__(self, s: str) -> None:
+        """Create the log functions for retries of the operation 's'."""
+        self._s = s
+        self._s_capitalized = s.capitalize()
+
+    def before(self, retry_state: tenacity.RetryCallState) -> None:
+        """Log an attempt, if it is not the first one."""
+        if retry_state.attempt_number > 1 and logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Trying %s again, attempt number %d...",
+                self._s,
+                retry_state.attempt_number,
+            )
+
+    def before_sleep(self, retry_state: tenacity.RetryCallState) -> None:
+        """Log a failure, and how long it takes until the next attempt."""
+        if not logger.isEnabledFor(logging.WARNING):
+            return
 
-    def log(retry_state: tenacity.RetryCallState) -> None:
         if (retry_state.next_action is not None) and (retry_state.outcome is not None):
             duration = retry_state.next_action.sleep
             if retry_state.outcome.failed:
@@ -101,35 +102,310 @@ def _make_log_before_sleep_function(
             else:
                 value = retry_state.outcome.result()
             logger.warning(
-                f"{s.capitalize()} failed, "
-                f"retrying in {duration:.0f} second(s): {value}"
+                "%s failed, retrying in %.0f second(s): %s",
+                self._s_capitalized,
+                duration,
+                value,
             )
 
-    return log
+
+# Client errors that may go away when a request is repeated, the other ones
+# (e.g. "404 Not Found") are not retried.
+_RETRYABLE_CLIENT_ERRORS: Final = frozenset(
+    {
+        408,  # Request Timeout
+        409,  # Conflict (e.g. an outdated offset)
+        423,  # Locked (the upload is used by another request)
+        429,  # Too Many Requests
+    }
+)
+
+
+def _is_retryable(e: BaseException) -> bool:
+    """Check if an operation that failed with the given exception should be retried."""
+    if not isinstance(e, aiohttp.ClientError):
+        return False
+
+    if isinstance(e, aiohttp.ClientResponseError) and (400 <= e.status < 500):
+        return e.status in _RETRYABLE_CLIENT_ERRORS
+
+    return True
+
+
+# The retry strategy does not depend on the configuration, so it is shared.
+_RETRY_STRATEGY: Final = tenacity.retry_if_exception(_is_retryable)
+
+
+@functools.lru_cache(maxsize=16)
+def _retrying_template(
+    s: str, retry_attempts: int, max_retry_period_seconds: float
+) -> tenacity.AsyncRetrying:
+    """Create the tenacity retry object that '_make_retrying()' copies."""
+    retry_logger = _RetryLogger(s)
+
+    return tenacity.AsyncRetrying(
+        # Make sure that the event loop keeps running while waiting for the
+        # next attempt, independent of what tenacity would pick by default.
+        sleep=asyncio.sleep,
+        retry=_RETRY_STRATEGY,
+        stop=tenacity.stop_after_attempt(retry_attempts),
+        wait=tenacity.wait_random_exponential(max=max_retry_period_seconds),
+        before=retry_logger.before,
+        before_sleep=retry_logger.before_sleep,
+    )
 
 
 def _make_retrying(s: str, config: RetryConfiguration) -> tenacity.AsyncRetrying:
     """Create a tenacity retry object."""
-    return tenacity.AsyncRetrying(
-        retry=tenacity.retry_if_exception_type(aiohttp.ClientError),
-        stop=tenacity.stop_after_attempt(config.retry_attempts),
-        wait=tenacity.wait_exponential(max=config.max_retry_period_seconds),
-        before=_make_log_before_function(s),
-        before_sleep=_make_log_before_sleep_function(s),
+    # The strategies and log functions are shared, but a retry object keeps
+    # the state of an ongoing retry loop, so every loop needs its own copy.
+    template = _retrying_template(
+        s, config.retry_attempts, config.max_retry_period_seconds
+    )
+    return cast(tenacity.AsyncRetrying, template.copy())
+
+
+# Maximum size of a response header in sessions created by aiotus.
+_MAX_FIELD_SIZE: Final = 64 * 1024
+
+# Minimum number of simultaneous connections of sessions created by aiotus
+# (the aiohttp default).
+_CONNECTION_LIMIT: Final = 100
+
+
+def _make_session(
+    config: RetryConfiguration, parallel_uploads: int = 1
+) -> aiohttp.ClientSession:
+    """Create the HTTP session used if the caller does not provide one."""
+    # aiohttp closes idle connections after 15 seconds by default, keep them
+    # around longer so that they can be reused after the (exponential) backoff
+    # periods between retries, instead of connecting (and doing the TLS
+    # handshake) again. For the same reason, resolved host names are cached
+    # longer than the default of 10 seconds.
+    #
+    # The connection limit is raised if more parallel uploads are requested
+    # than aiohttp allows by default, so that the uploads don't end up
+    # waiting for each other.
+    connector = aiohttp.TCPConnector(
+        limit=max(_CONNECTION_LIMIT, parallel_uploads),
+        keepalive_timeout=75,
+        ttl_dns_cache=300,
     )
 
+    # The "Upload-Metadata" header returned by the server can easily exceed
+    # the default limit of 8 KiB for the size of a header (e.g. when the
+    # metadata contains thumbnails).
+    return aiohttp.ClientSession(
+        connector=connector, timeout=config.timeout, max_field_size=_MAX_FIELD_SIZE
+    )
+
+
+# Errors that are reported by returning 'None' from the upload functions,
+# anything else (e.g. programming errors) is passed on to the caller.
+_UPLOAD_ERRORS: Final = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,  # Not an 'OSError' before Python 3.11.
+    common.ProtocolError,
+    OSError,
+    RuntimeError,
+    ValueError,
+)
+
+
+# Server configurations that were queried using a session, so that further uploads
+# with the same session don't have to query them again. They are kept per
+# endpoint and request headers, as the headers (e.g. for authorization) may
+# change what the server reports.
+_ConfigurationKey = tuple[yarl.URL, frozenset[tuple[str, str]]]
+_configurations: weakref.WeakKeyDictionary[
+    aiohttp.ClientSession, dict[_ConfigurationKey, core.ServerConfiguration]
+] = weakref.WeakKeyDictionary()
+
+
+async def _configuration(
+    session: aiohttp.ClientSession,
+    url: yarl.URL,
+    config: RetryConfiguration,
+    headers: Optional[Mapping[str, str]],
+) -> core.ServerConfiguration:
+    """Query the configuration of a server, or return the one queried before."""
+    server_configs = _configurations.setdefault(session, {})
+    key = (url, frozenset((headers or {}).items()))
+
+    if key not in server_configs:
+        async for attempt in _make_retrying("query configuration", config):
+            with attempt:
+                server_configs[key] = await core.configuration(
+                    session, url, ssl=config.ssl, headers=headers
+                )
+
+    return server_configs[key]
+
+
+def _encode_metadata(metadata: Optional[common.Metadata]) -> str:
+    """Encode the given optional metadata object for the "Upload-Metadata" header."""
+    # Encode the metadata once here, as this function is called outside of
+    # any code that does retries, so that invalid arguments are caught early
+    # and the exception is not swallowed. The result is then used for all
+    # attempts to create the upload.
+    return creation.encode_metadata(metadata or {})
+
+
+class _FilePart(io.RawIOBase):
+    """A window into a file, used to upload the parts of a file in parallel."""
+
+    def __init__(
+        self, file: BinaryIO, lock: threading.Lock, start: int, length: int
+    ) -> None:
+        super().__init__()
 
-def _sanitize_metadata(metadata: Optional[common.Metadata]) -> common.Metadata:
-    """Make sure the given optional metadata object is valid."""
-    if metadata is None:
-        metadata = {}
+        self._file = file
+
+        # The lock is shared between all parts of the file, as they all
+        # change the position of the underlying file object.
+        self._lock = lock
+
+        self._start = start
+        self._length = length
+
+        # The current position, relative to the start of the part.
+        self._position = 0
+
+    def readable(self) -> bool:  # noqa: D102
+        return True
+
+    def seekable(self) -> bool:  # noqa: D102
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:  # noqa: D102
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._length + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence}).")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}.")
+
+        self._position = position
+        return position
+
+    def tell(self) -> int:  # noqa: D102
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:  # noqa: D102
+        remaining = max(0, self._length - self._position)
+        if (size < 0) or (size > remaining):
+            size = remaining
+
+        with self._lock:
+            self._file.seek(self._start + self._position, io.SEEK_SET)
+            data = self._file.read(size)
+
+        self._position += len(data)
+        return data
+
+
+async def _split_file(
+    file: BinaryIO, chunksize: common.ChunkSize, parts: int
+) -> list[BinaryIO]:
+    """Split a file into parts that can be uploaded in parallel.
+
+    Each part is at least one chunk long, so small files are split into
+    fewer parts (or not at all).
+    """
+    total_size = await common.buffer_size(file)
 
-    # Try to encode the metadata once here, as this function is called outside
-    # of any code that does retries, so that invalid arguments are caught early
-    # and the exception is not swallowed.
-    creation.encode_metadata(metadata)
+    if chunksize == "auto":
+        chunksize = core.MIN_AUTO_CHUNKSIZE
 
-    return metadata
+    if (parts := min(parts, math.ceil(total_size / max(1, chunksize)))) < 2:
+        return [file]
+
+    part_size = math.ceil(total_size / parts)
+    lock = threading.Lock()
+
+    return [
+        cast(BinaryIO, _FilePart(file, lock, start, min(part_size, total_size - start)))
+        for start in range(0, total_size, part_size)
+    ]
+
+
+def _absolute_location(url: yarl.URL, location: yarl.URL) -> yarl.URL:
+    """Resolve a location returned by the server against the creation URL."""
+    if not location.is_absolute():
+        location = url / location.path
+        logger.debug("Upload URL was relative, changed to '%s'.", location)
+
+    return location
+
+
+async def _create_and_upload(
+    session: aiohttp.ClientSession,
+    url: yarl.URL,
+    file: BinaryIO,
+    metadata_header: str,
+    config: RetryConfiguration,
+    headers: Optional[Mapping[str, str]],
+    chunksize: common.ChunkSize,
+) -> yarl.URL:
+    """Create an upload and upload the file to it, retrying on communication errors.
+
+    Helper function for 'upload()' and 'upload_multiple()'.
+    """
+    create_headers = headers
+    if metadata_header:
+        create_headers = {**(headers or {}), "Upload-Metadata": metadata_header}
+
+    # The offset of a new upload is known (it is empty, or the server reports
+    # how much of the data sent along with the creation it got), so the first
+    # attempt to upload the data does not need to ask for it. Retries have to.
+    initial_offset: Optional[int] = 0
+
+    async for attempt in _make_retrying("upload creation", config):
+        with attempt:
+            if config.creation_with_upload:
+                location, initial_offset = await creation.create_with_upload(
+                    session,
+                    url,
+                    file,
+                    {},
+                    ssl=config.ssl,
+                    headers=create_headers,
+                    chunksize=(
+                        core.MIN_AUTO_CHUNKSIZE if chunksize == "auto" else chunksize
+                    ),
+                )
+            else:
+                location = await creation.create(
+                    session,
+                    url,
+                    file,
+                    {},
+                    ssl=config.ssl,
+                    headers=create_headers,
+                )
+
+    logger.debug("Upload created, upload URL is '%s'.", location)
+    location = _absolute_location(url, location)
+
+    async for attempt in _make_retrying("upload", config):
+        with attempt:
+            known_offset, initial_offset = initial_offset, None
+            await core.upload_buffer(
+                session,
+                location,
+                file,
+                ssl=config.ssl,
+                chunksize=chunksize,
+                headers=headers,
+                initial_offset=known_offset,
+            )
+
+    return location
 
 
 async def upload(
@@ -137,74 +413,87 @@ async def upload(
     file: BinaryIO,
     metadata: Optional[common.Metadata] = None,
     client_session: Optional[aiohttp.ClientSession] = None,
-    config: RetryConfiguration = RetryConfiguration(),
+    config: Optional[RetryConfiguration] = None,
     headers: Optional[Mapping[str, str]] = None,
-    chunksize: int = 4 * 1024 * 1024,
+    chunksize: common.ChunkSize = 4 * 1024 * 1024,
+    parallel_uploads: int = 1,
 ) -> Optional[yarl.URL]:
     """Upload a file to a tus server.
 
     This function creates an upload on the server and then uploads
     the data to that location.
 
+    If more than one parallel upload is requested and the server supports
+    the "concatenation" extension, the file is split into parts that are
+    uploaded in parallel, and then combined on the server-side
+    (see :func:`upload_multiple`). Otherwise the file is uploaded sequentially.
+
     In case of a communication error, this function retries the upload.
+    Client errors (status codes 4xx) are only retried if they may be
+    temporary, like "429 Too Many Requests".
 
     :param endpoint: The creation endpoint of the server.
     :param file: The file to upload.
     :param metadata: Additional metadata for the upload.
-    :param client_session: An aiohttp ClientSession to use.
-    :param config: Settings to customize the retry behaviour.
+    :param client_session: An aiohttp ClientSession to use. The configuration
+        of the server (that is needed to upload parts) is queried only once per
+        session, endpoint and headers, and used for the lifetime of the session.
+    :param config: Settings to customize the retry behaviour
+        (the defaults of :class:`RetryConfiguration` if not given).
     :param headers: Optional headers used in the request.
-    :param chunksize: The size of individual chunks to upload at a time.
+    :param chunksize: The size of individual chunks to upload at a time,
+        or "auto" to adapt it to the throughput.
+    :param parallel_uploads: The number of parts to upload in parallel.
     :return: The location where the file was uploaded to (if the upload succeeded).
     """
     url = yarl.URL(endpoint)
-    metadata = _sanitize_metadata(metadata)
-
-    retrying_create = _make_retrying("upload creation", config)
-    retrying_upload_file = _make_retrying("upload", config)
+    metadata_header = _encode_metadata(metadata)
+    if config is None:
+        config = RetryConfiguration()
 
     try:
+        # Fail before anything is sent to the server.
+        common.check_chunksize(chunksize)
+
         ctx: Union[aiohttp.ClientSession, AsyncContextManager[aiohttp.ClientSession]]
         if client_session is None:
-            ctx = aiohttp.ClientSession()
+            ctx = _make_session(config, parallel_uploads)
         else:
-            ctx = asyncnullcontext(client_session)
+            ctx = nullcontext(client_session)
 
         async with ctx as session:
-            async for attempt in retrying_create:
-                with attempt:
-                    location = await creation.create(
+            if (parallel_uploads > 1) and (
+                len(parts := await _split_file(file, chunksize, parallel_uploads)) > 1
+            ):
+                server_config = await _configuration(session, url, config, headers)
+                if "concatenation" in server_config.protocol_extensions:
+                    location = await _upload_and_concatenate(
                         session,
                         url,
-                        file,
-                        metadata,
-                        ssl=config.ssl,
-                        headers=headers,
+                        parts,
+                        metadata_header,
+                        config,
+                        headers,
+                        chunksize,
+                        parallel_uploads,
                     )
+                    return _absolute_location(url, location)
 
-            logger.debug(f"Upload created, upload URL is '{location}'.")
-            if not location.is_absolute():
-                location = url / location.path
-                logger.debug(f"Upload URL was relative, changed to '{location}'.")
-
-            async for attempt in retrying_upload_file:
-                with attempt:
-                    await core.upload_buffer(
-                        session,
-                        location,
-                        file,
-                        ssl=config.ssl,
-                        chunksize=chunksize,
-                        headers=headers,
-                    )
+                logger.info(
+                    'Server does not support the "concatenation" extension, '
+                    "uploading the file sequentially."
+                )
 
-            return location
+            return await _create_and_upload(
+                session, url, file, metadata_header, config, headers, chunksize
+            )
     except tenacity.RetryError as e:
         logger.error(
-            f"Unable to upload file, even after retrying: {e.last_attempt.exception()}"
+            "Unable to upload file, even after retrying: %s",
+            e.last_attempt.exception(),
         )
-    except Exception as e:
-        logger.error(f"Unable to upload file: {e}")
+    except _UPLOAD_ERRORS as e:
+        logger.error("Unable to upload file: %s", e)
 
     return None
 
@@ -212,7 +501,7 @@ async def upload(
 async def metadata(
     endpoint: Union[str, yarl.URL],
     client_session: Optional[aiohttp.ClientSession] = None,
-    config: RetryConfiguration = RetryConfiguration(),
+    config: Optional[RetryConfiguration] = None,
     headers: Optional[Mapping[str, str]] = None,
 ) -> Optional[common.Metadata]:
     """Read back the metadata of an upload.
@@ -221,23 +510,28 @@ async def metadata(
     tus protocol.
 
     In case of a communication error, this function retries.
+    Client errors (status codes 4xx) are only retried if they may be
+    temporary, like "429 Too Many Requests".
 
     :param endpoint: The location of the upload.
     :param client_session: An aiohttp ClientSession to use.
-    :param config: Settings to customize the retry behaviour.
+    :param config: Settings to customize the retry behaviour
+        (the defaults of :class:`RetryConfiguration` if not given).
     :param headers: Optional headers used in the request.
     :return: The metadata associated with the upload.
     """
     url = yarl.URL(endpoint)
+    if config is None:
+        config = RetryConfiguration()
 
     retrying_metadata = _make_retrying("query metadata", config)
 
     try:
         ctx: Union[aiohttp.ClientSession, AsyncContextManager[aiohttp.ClientSession]]
         if client_session is None:
-            ctx = aiohttp.ClientSession()
+            ctx = _make_session(config)
         else:
-            ctx = asyncnullcontext(client_session)
+            ctx = nullcontext(client_session)
 
         async with ctx as session:
             async for attempt in retrying_metadata:
@@ -247,47 +541,143 @@ async def metadata(
                     )
     except tenacity.RetryError as e:
         logger.error(
-            f"Unable to get metadata, even after retrying: {e.last_attempt.exception()}"
+            "Unable to get metadata, even after retrying: %s",
+            e.last_attempt.exception(),
         )
+    except aiohttp.ClientResponseError as e:
+        logger.error("Unable to get metadata: %s", e)
 
     return None
 
 
-async def _upload_partial(
-    semaphore: asyncio.Semaphore,
-    endpoint: Union[str, yarl.URL],
-    file: BinaryIO,
-    client_session: Optional[aiohttp.ClientSession],
+async def _upload_parts(
+    parts: Iterator[tuple[int, Union[BinaryIO, Callable[[], BinaryIO]]]],
+    paths: list[str],
+    session: aiohttp.ClientSession,
+    url: yarl.URL,
+    config: RetryConfiguration,
+    headers: Mapping[str, str],
+    chunksize: common.ChunkSize,
+) -> None:
+    """Upload parts of an upload with the "concatenation" extension.
+
+    Helper function for 'upload_multiple()'. The parts are taken from an
+    iterator shared by all workers, and the path of each uploaded part is
+    stored at its index in 'paths'.
+    """
+    for index, file in parts:
+        if callable(file):
+            # Open the file only when it is uploaded, and close it right after.
+            with await asyncio.to_thread(file) as f:
+                location = await _create_and_upload(
+                    session, url, f, "", config, headers, chunksize
+                )
+        else:
+            location = await _create_and_upload(
+                session, url, file, "", config, headers, chunksize
+            )
+
+        paths[index] = location.path
+
+
+async def _upload_and_concatenate(
+    session: aiohttp.ClientSession,
+    url: yarl.URL,
+    files: Iterable[Union[BinaryIO, Callable[[], BinaryIO]]],
+    metadata_header: str,
     config: RetryConfiguration,
     headers: Optional[Mapping[str, str]],
-    chunksize: int,
-) -> str:
-    """Upload a single part of an upload with the "concatenation" extension.
+    chunksize: common.ChunkSize,
+    parallel_uploads: int,
+) -> yarl.URL:
+    """Upload the parts and concatenate them, retrying on communication errors.
 
-    Helper function for 'upload_multiple()'.
+    Helper function for 'upload()' and 'upload_multiple()'.
     """
-    tus_headers = dict(headers or {})
-    tus_headers["Upload-Concat"] = "partial"
-
-    async with semaphore:
-        url = await upload(
-            endpoint, file, None, client_session, config, tus_headers, chunksize
+    #
+    # Upload the individual parts.
+    #
+
+    if not (files := list(files)):
+        raise RuntimeError("No files to upload.")
+
+    # The same headers are used for all parts.
+    partial_headers = {**(headers or {}), "Upload-Concat": "partial"}
+
+    # A fixed number of workers take the parts one after another, which
+    # limits the number of uploads that are done in parallel.
+    parts = enumerate(files)
+    paths = [""] * len(files)
+    tasks = [
+        asyncio.create_task(
+            _upload_parts(
+                parts, paths, session, url, config, partial_headers, chunksize
+            )
         )
+        for _ in range(min(parallel_uploads, len(files)))
+    ]
 
-    if url is None:
-        raise RuntimeError("Unable to upload part.")
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Stop the other uploads as soon as a part failed (or when we
+        # got cancelled), and wait until they are actually stopped.
+        if pending := [t for t in tasks if not t.done()]:
+            logger.info("Cancelling other uploads...")
+            for t in pending:
+                t.cancel()
+
+            await asyncio.wait(pending)
+
+        # Retrieve the errors of all parts (also of those that failed while
+        # being cancelled), otherwise asyncio logs them as never retrieved.
+        failed = [t for t in tasks if t.done() and not t.cancelled() and t.exception()]
+
+    if failed:
+        t = failed[0]
+        e = t.exception()
+        if isinstance(e, tenacity.RetryError):
+            # Report the error of the last attempt, not the wrapper.
+            e = e.last_attempt.exception()
+        elif not isinstance(e, _UPLOAD_ERRORS):
+            # Pass on unexpected errors (e.g. programming errors)
+            # unchanged, by retrieving the result of the task.
+            t.result()
+
+        raise RuntimeError(f"Upload of a part failed: {e}") from e
+
+    #
+    # Do the final concatenation.
+    #
+    final_headers = {
+        **(headers or {}),
+        "Upload-Concat": "final;" + " ".join(paths),
+    }
+    if metadata_header:
+        final_headers["Upload-Metadata"] = metadata_header
+
+    async for attempt in _make_retrying("upload creation", config):
+        with attempt:
+            location = await creation.create(
+                session,
+                url,
+                None,
+                {},
+                ssl=config.ssl,
+                headers=final_headers,
+            )
 
-    return url.path
+    return location
 
 
 async def upload_multiple(
     endpoint: Union[str, yarl.URL],
-    files: Iterable[BinaryIO],
+    files: Iterable[Union[BinaryIO, Callable[[], BinaryIO]]],
     metadata: Optional[common.Metadata] = None,
     client_session: Optional[aiohttp.ClientSession] = None,
-    config: RetryConfiguration = RetryConfiguration(),
+    config: Optional[RetryConfiguration] = None,
     headers: Optional[Mapping[str, str]] = None,
-    chunksize: int = 4 * 1024 * 1024,
+    chunksize: common.ChunkSize = 4 * 1024 * 1024,
     parallel_uploads: int = 3,
 ) -> Optional[yarl.URL]:
     """Upload multiple files using the "concatenation" extension.
@@ -296,92 +686,69 @@ async def upload_multiple(
     to combine the parts on the server-side.
 
     :param endpoint: The creation endpoint of the server.
-    :param files: The files to upload.
+    :param files: The files to upload, or functions that open them. Files
+        returned by such a function are opened only when their upload starts
+        and are closed after it, so that no more files are open at a time
+        than there are parallel uploads.
     :param metadata: Additional metadata for the final upload.
-    :param client_session: An aiohttp ClientSession to use.
-    :param config: Settings to customize the retry behaviour.
+    :param client_session: An aiohttp ClientSession to use. The configuration
+        of the server (that is needed to upload parts) is queried only once per
+        session, endpoint and headers, and used for the lifetime of the session.
+    :param config: Settings to customize the retry behaviour
+        (the defaults of :class:`RetryConfiguration` if not given).
     :param headers: Optional headers used in the request.
-    :param chunksize: The size of individual chunks to upload at a time.
+    :param chunksize: The size of individual chunks to upload at a time,
+        or "auto" to adapt it to the throughput.
     :param parallel_uploads: The number of parallel uploads to do concurrently.
     :return: The location of the final (concatenated) file on the server.
     :raises RuntimeError: If the server does not support the "concatenation" extension.
+    :raises ValueError: If the number of parallel uploads is not positive.
     """
-    url = yarl.URL(endpoint)
-    metadata = _sanitize_metadata(metadata)
+    # Otherwise no upload would ever be started.
+    if parallel_uploads < 1:
+        raise ValueError("The number of parallel uploads must be positive.")
 
-    retrying_config = _make_retrying("query configuration", config)
-    retrying_create = _make_retrying("upload creation", config)
+    url = yarl.URL(endpoint)
+    metadata_header = _encode_metadata(metadata)
+    if config is None:
+        config = RetryConfiguration()
 
     try:
+        # Fail before anything is sent to the server.
+        common.check_chunksize(chunksize)
+
         ctx: Union[aiohttp.ClientSession, AsyncContextManager[aiohttp.ClientSession]]
         if client_session is None:
-            ctx = aiohttp.ClientSession()
+            ctx = _make_session(config, parallel_uploads)
         else:
-            ctx = asyncnullcontext(client_session)
+            ctx = nullcontext(client_session)
 
         async with ctx as session:
             #
             # Check if the server supports the "concatenation" extension.
             #
-            async for attempt in retrying_config:
-                with attempt:
-                    server_config = await core.configuration(
-                        session, url, ssl=config.ssl, headers=headers
-                    )
-
+            server_config = await _configuration(session, url, config, headers)
             if "concatenation" not in server_config.protocol_extensions:
                 raise RuntimeError(
                     'Server does not support the "concatenation" extension.'
                 )
 
-            #
-            # Upload the individual parts.
-            #
-
-            # Used to limit the number of coroutines that perform uploads in parallel.
-            semaphore = asyncio.Semaphore(parallel_uploads)
-
-            coros = [
-                _upload_partial(
-                    semaphore, endpoint, f, session, config, headers, chunksize
-                )
-                for f in files
-            ]
-            tasks = [asyncio.create_task(c) for c in coros]
-
-            try:
-                paths = await asyncio.gather(*tasks)
-            except Exception as e:
-                logger.info("Cancelling other uploads...")
-                for t in tasks:
-                    if not t.done():
-                        t.cancel()
-
-                raise RuntimeError(f"Upload of a part failed: {e}")
-
-            concat_header = "final;" + " ".join(paths)
-
-            #
-            # Do the final concatenation.
-            #
-            final_headers = dict(headers or {})
-            final_headers.update({"Upload-Concat": concat_header})
-
-            async for attempt in retrying_create:  # pragma: no branch
-                with attempt:
-                    return await creation.create(
-                        session,
-                        url,
-                        None,
-                        metadata,
-                        ssl=config.ssl,
-                        headers=final_headers,
-                    )
+            return await _upload_and_concatenate(
+                session,
+                url,
+                files,
+                metadata_header,
+                config,
+                headers,
+                chunksize,
+                parallel_uploads,
+            )
     except tenacity.RetryError as e:
         logger.error(
-            f"Unable to upload files, even after retrying: {e.last_attempt.exception()}"
+            "Unable to upload files, even after retrying: %s",
+            e.last_attempt.exception(),
         )
-    except Exception as e:
-        logger.error(f"Unable to upload files: {e}")
+    except _UPLOAD_ERRORS as e:
+        logger.error("Unable to upload files: %s", e)
 
     return None
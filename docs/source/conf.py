@@ -8,6 +8,8 @@ aiotus_path = os.path.join(os.path.dirname(__file__), '../..')
 aiotus_path = os.path.abspath(aiotus_path)
 sys.path.insert(0, aiotus_path)
 
+_VERSION_RE = re.compile(r'current_version\s*=\s*(\d+\.\d+\.\d+)')
+
 
 def get_version():
     """Return package version from the bumpversion configuration file (hacky)."""
@@ -17,10 +19,13 @@ def get_version():
         with open(filename, 'r') as fd:
             setup_py = fd.read()
 
-        m = re.search(r'current_version\s*=\s*(\d+\.\d+\.\d+)', setup_py)
+        m = _VERSION_RE.search(setup_py)
+        if m is None:
+            raise ValueError('no version found')
+
         return m.group(1)
-    except:
-        sys.exit('Unable to get package version from configuration file.')
+    except (OSError, ValueError) as e:
+        sys.exit(f'Unable to get package version from configuration file: {e}')
 
 
 project = 'aiotus'
@@ -49,6 +49,12 @@ async def tus_server(aiohttp_server):
         state["data"] = bytearray()
 
         headers = {"Location": str(state["upload_endpoint"])}
+
+        # Data sent along with the creation ("creation-with-upload" extension).
+        if request.content_type == "application/offset+octet-stream":
+            state["data"].extend(await request.read())
+            headers["Upload-Offset"] = str(len(state["data"]))
+
         raise aiohttp.web.HTTPCreated(headers=headers)
 
     async def handler_options(request):
@@ -149,7 +155,7 @@ class TusServer:
     certificate: Optional[str] = None
 
 
-@pytest_asyncio.fixture(scope="module")
+@pytest_asyncio.fixture(scope="session")
 def tusd(pytestconfig, xprocess):
     """Start the tusd (tus.io reference implementation) and yield the upload URL.
 
@@ -222,7 +228,7 @@ _nginx_conf = """
 """
 
 
-@pytest_asyncio.fixture(scope="module")
+@pytest_asyncio.fixture(scope="session")
 def nginx_proxy(xprocess, tusd):
     """Start an nginx proxy in front of tusd that does TLS termination."""
 
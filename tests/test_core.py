@@ -1,8 +1,12 @@
 """Test the implementation of the core protocol."""
 
+import base64
 import binascii
+import gzip
+import io
 
 import aiohttp
+import multidict
 import pytest  # type: ignore
 
 import aiotus
@@ -68,6 +72,20 @@ class TestOffset:
 
         assert 'Unable to convert "Upload-Offset" header' in str(excinfo.value)
 
+    def test_parse_positive_integer_header(self):
+        """Only plain decimal digits are accepted."""
+
+        parse = aiotus.common.parse_positive_integer_header
+
+        for value in ("0", "123", "007"):
+            headers = multidict.CIMultiDictProxy(multidict.CIMultiDict(x=value))
+            assert parse(headers, "x") == int(value)
+
+        for value in ("", "+1", " 1", "1_000", "١٢", "²"):
+            headers = multidict.CIMultiDictProxy(multidict.CIMultiDict(x=value))
+            with pytest.raises(aiotus.ProtocolError):
+                parse(headers, "x")
+
     async def test_offset_functional(self, aiohttp_server):
         """Test the normal functionality of the '_offset' function."""
 
@@ -122,6 +140,13 @@ class TestMetadata:
             aiotus.core._parse_metadata("k1 dj&=")
         assert any(s in str(excinfo.value) for s in ("Non-base64", "Only base64"))
 
+        value = bytes(range(256)) * 4
+        md = aiotus.core._parse_metadata(f"k {base64.b64encode(value).decode()}")
+        assert md == {"k": value}
+
+        with pytest.raises(binascii.Error):
+            aiotus.core._parse_metadata("k " + "dj&=" * 100)
+
         with pytest.raises(ValueError) as excinfo:
             aiotus.core._parse_metadata("k v v")
         assert "more than two elements" in str(excinfo.value)
@@ -183,6 +208,24 @@ class TestUploadBuffer:
         assert tus_server["data"] is not None
         assert tus_server["data"] == memory_file.getbuffer()
 
+    async def test_initial_offset(self, tus_server, memory_file):
+        """Test that a known offset is not queried from the server."""
+
+        tus_server["data"] = bytearray()
+
+        async with aiohttp.ClientSession() as s:
+            await aiotus.core.upload_buffer(
+                s,
+                tus_server["upload_endpoint"],
+                memory_file,
+                ssl=False,
+                chunksize=3,
+                initial_offset=0,
+            )
+
+        assert tus_server["head_headers"] is None
+        assert tus_server["data"] == memory_file.getbuffer()
+
     async def test_server_offset(self, tus_server, memory_file):
         """Test if the upload routine honors the offset value at the server-side."""
 
@@ -199,6 +242,134 @@ class TestUploadBuffer:
         assert tus_server["data"] is not None
         assert tus_server["data"] == memory_file.getbuffer()
 
+    async def test_blocks(self, tus_server, memory_file, monkeypatch):
+        """Test reading the chunks in multiple blocks."""
+
+        monkeypatch.setattr(aiotus.common, "_READ_BLOCKSIZE", 1)
+
+        tus_server["data"] = bytearray()
+        tus_server["drop_upload"] = True
+
+        async with aiohttp.ClientSession() as s:
+            await aiotus.core.upload_buffer(
+                s, tus_server["upload_endpoint"], memory_file, ssl=False, chunksize=3
+            )
+
+        assert tus_server["data"] == memory_file.getbuffer()
+
+    async def test_invalid_chunksize(self, tus_server, memory_file):
+        """Chunks have to contain data, otherwise the upload would never end."""
+
+        tus_server["data"] = bytearray()
+
+        for chunksize in (0, -1):
+            with pytest.raises(ValueError) as excinfo:
+                async with aiohttp.ClientSession() as s:
+                    await aiotus.core.upload_buffer(
+                        s,
+                        tus_server["upload_endpoint"],
+                        memory_file,
+                        chunksize=chunksize,
+                    )
+
+            assert "must be positive" in str(excinfo.value)
+
+        # Strings other than "auto" are not taken as a number.
+        for chunksize in ("autp", "65536"):
+            with pytest.raises(ValueError) as excinfo:
+                async with aiohttp.ClientSession() as s:
+                    await aiotus.core.upload_buffer(
+                        s,
+                        tus_server["upload_endpoint"],
+                        memory_file,
+                        chunksize=chunksize,
+                    )
+
+            assert "Invalid chunksize" in str(excinfo.value)
+
+        assert tus_server["data"] == b""
+
+    async def test_auto_chunksize(self, tus_server, memory_file, monkeypatch):
+        """Test adapting the chunksize to the throughput."""
+
+        monkeypatch.setattr(aiotus.core, "MIN_AUTO_CHUNKSIZE", 1)
+        monkeypatch.setattr(aiotus.core, "MAX_AUTO_CHUNKSIZE", 1)
+
+        tus_server["data"] = bytearray()
+        tus_server["drop_upload"] = True
+
+        async with aiohttp.ClientSession() as s:
+            await aiotus.core.upload_buffer(
+                s,
+                tus_server["upload_endpoint"],
+                memory_file,
+                ssl=False,
+                chunksize="auto",
+            )
+
+        assert tus_server["data"] == memory_file.getbuffer()
+
+    def test_adapt_chunksize(self):
+        adapt = aiotus.core._adapt_chunksize
+
+        assert adapt(1024 * 1024, 2.0) == 1024 * 1024
+        assert adapt(1024 * 1024, 0.5) == 4 * 1024 * 1024
+        assert adapt(1, 10.0) == aiotus.core.MIN_AUTO_CHUNKSIZE
+        assert adapt(1024 * 1024, 0.0) == aiotus.core.MAX_AUTO_CHUNKSIZE
+        assert adapt(1024 * 1024 * 1024, 1.0) == aiotus.core.MAX_AUTO_CHUNKSIZE
+
+    async def test_upload_file(self, tus_server, tmp_path):
+        """Test the upload of a regular file, that is read with positional reads."""
+
+        data = bytes(range(256))
+        path = tmp_path / "data"
+        path.write_bytes(data)
+
+        tus_server["data"] = bytearray()
+        tus_server["drop_upload"] = True
+
+        with open(path, "rb") as file:
+            async with aiohttp.ClientSession() as s:
+                await aiotus.core.upload_buffer(
+                    s, tus_server["upload_endpoint"], file, ssl=False, chunksize=100
+                )
+
+        assert tus_server["data"] == data
+
+    async def test_read_compressed_file(self, tmp_path):
+        """Wrapped files must not be read through their file descriptor."""
+
+        data = bytes(range(256)) * 10
+        path = tmp_path / "data.gz"
+        path.write_bytes(gzip.compress(data))
+
+        with gzip.open(path, "rb") as file:
+            reader = aiotus.common.BufferReader(file)
+            assert reader._fd is None
+            assert reader._read(0, 16) == data[:16]
+
+        with open(path, "rb") as file:
+            assert aiotus.common.BufferReader(file)._fd is not None
+
+    async def test_upload_compressed_file(self, tus_server, tmp_path):
+        """The data returned by a file wrapper is uploaded, not the file below it."""
+
+        data = bytes(range(256)) * 10
+        path = tmp_path / "data.gz"
+        path.write_bytes(gzip.compress(data))
+
+        tus_server["data"] = bytearray()
+
+        with gzip.open(path, "rb") as file:
+            assert await aiotus.common.buffer_size(file) == len(data)
+
+            async with aiohttp.ClientSession() as s:
+                await aiotus.core.upload_buffer(
+                    s, tus_server["upload_endpoint"], file, chunksize=1000
+                )
+
+        assert tus_server["data"] == data
+
     async def test_server_error(self, tus_server, memory_file):
         """Simulate a server error."""
 
@@ -239,6 +410,24 @@ class TestUploadBuffer:
 
         assert "Buffer returned unexpected EOF" in str(excinfo.value)
 
+    async def test_read_error(self, tus_server):
+        """Reading errors must not be mistaken for communication errors."""
+
+        class BrokenBytesIO(io.BytesIO):
+            def read(self, *args, **kwargs):
+                raise OSError("read failed")
+
+        tus_server["data"] = bytearray()
+
+        with pytest.raises(RuntimeError) as excinfo:
+            async with aiohttp.ClientSession() as s:
+                await aiotus.core.upload_buffer(
+                    s, tus_server["upload_endpoint"], BrokenBytesIO(b"\x00\x01")
+                )
+
+        assert "read failed" in str(excinfo.value)
+        assert isinstance(excinfo.value.__cause__, OSError)
+
 
 class TestConfiguration:
     async def test_configuration_exceptions(self, aiohttp_server):
@@ -304,9 +493,17 @@ class TestConfiguration:
             }
             raise aiohttp.web.HTTPOk(headers=headers)
 
+        async def handler_whitespace(request):
+            headers = {
+                "Tus-Version": "1.0.0",
+                "Tus-Extension": " creation, checksum",
+            }
+            raise aiohttp.web.HTTPOk(headers=headers)
+
         app = aiohttp.web.Application()
         app.router.add_route("OPTIONS", "/only_version", handler_only_version)
         app.router.add_route("OPTIONS", "/all", handler_all)
+        app.router.add_route("OPTIONS", "/whitespace", handler_whitespace)
         server = await aiohttp_server(app)
 
         # The server only returns the protocol version.
@@ -332,6 +529,13 @@ class TestConfiguration:
         assert config.protocol_extensions[0] == "creation"
         assert config.protocol_extensions[1] == "checksum"
 
+        # Whitespace around the elements of a list is not part of them.
+        url = server.make_url("/whitespace")
+        async with aiohttp.ClientSession() as session:
+            config = await aiotus.core.configuration(session, url)
+
+        assert config.protocol_extensions == ["creation", "checksum"]
+
     async def test_configuration_function_tusd(self, tusd):
         """Test the normal functionality of the 'configuration()' function with tusd."""
 
@@ -1,7 +1,10 @@
 """Test the implementation of the creation extension."""
 
+import base64
+
 import aiohttp
 import pytest  # type: ignore
+import yarl
 
 import aiotus
 
@@ -28,6 +31,29 @@ class TestCreate:
 
         assert "commas" in str(excinfo.value)
 
+    def test_encode_metadata_pybase64(self, monkeypatch):
+        """pybase64 is only used for values from a minimum size on."""
+
+        encoded = []
+
+        class FakePybase64:
+            @staticmethod
+            def b64encode(value):
+                encoded.append(value)
+                return base64.b64encode(value)
+
+        monkeypatch.setattr(aiotus.creation, "pybase64", FakePybase64)
+
+        short = b"\x00" * (aiotus.common.PYBASE64_MIN_SIZE - 1)
+        long = b"\x00" * aiotus.common.PYBASE64_MIN_SIZE
+        metadata = aiotus.creation.encode_metadata({"short": short, "long": long})
+
+        assert metadata == (
+            f"short {base64.b64encode(short).decode()},"
+            f"long {base64.b64encode(long).decode()}"
+        )
+        assert encoded == [long]
+
     async def test_create_wrong_status(self, aiohttp_server, memory_file):
         """Check if status code is checked correctly."""
 
@@ -85,3 +111,50 @@ class TestCreate:
             )
 
         assert tus_server["upload_endpoint"] == location
+
+    async def test_create_with_upload(self, aiohttp_server, memory_file):
+        """Create an upload and send data along with the request."""
+
+        received = {}
+
+        async def handler(request):
+            received["headers"] = request.headers
+            received["body"] = await request.read()
+
+            headers = {"Location": "/files/1234"}
+            if request.path == "/files":
+                headers["Upload-Offset"] = str(len(received["body"]))
+
+            raise aiohttp.web.HTTPCreated(headers=headers)
+
+        app = aiohttp.web.Application()
+        app.router.add_route("POST", "/files", handler)
+        app.router.add_route("POST", "/no_offset", handler)
+        server = await aiohttp_server(app)
+
+        async with aiohttp.ClientSession() as session:
+            location, offset = await aiotus.creation.create_with_upload(
+                session, server.make_url("/files"), memory_file, {}, chunksize=3
+            )
+
+            assert location == yarl.URL("/files/1234")
+            assert offset == 3
+            assert received["body"] == b"\x00\x01\x02"
+            assert received["headers"]["Upload-Length"] == "4"
+            assert received["headers"]["Content-Length"] == "3"
+
+            # The server does not have to report the offset.
+            location, offset = await aiotus.creation.create_with_upload(
+                session, server.make_url("/no_offset"), memory_file, {}
+            )
+
+            assert offset is None
+            assert received["body"] == b"\x00\x01\x02\x03"
+
+            # Without data the remaining upload would never end.
+            with pytest.raises(ValueError) as excinfo:
+                await aiotus.creation.create_with_upload(
+                    session, server.make_url("/files"), memory_file, {}, chunksize=0
+                )
+
+            assert "must be positive" in str(excinfo.value)
@@ -18,9 +18,24 @@ class TestAiotusClients:
                 assert len(lines) >= 0
                 assert lines[0] == "No command specified."
 
+    def test_run(self):
+        async def answer():
+            return 42
+
+        with unittest.mock.patch.object(aiotus.entrypoint, "uvloop", None):
+            assert 42 == aiotus.entrypoint._run(answer())
+
+        uvloop = unittest.mock.Mock()
+        uvloop.run.return_value = 23
+        with unittest.mock.patch.object(aiotus.entrypoint, "uvloop", uvloop):
+            coro = answer()
+            assert 23 == aiotus.entrypoint._run(coro)
+            uvloop.run.assert_called_once_with(coro)
+            coro.close()
+
     def test_aiotus_clients(self, tusd):
         conf = aiotus.RetryConfiguration(1, 0.001, None)
-        defaults = (None, None, conf, None, 4 * 1024 * 1024)
+        defaults = (None, None, conf, None, 4 * 1024 * 1024, 1)
         with unittest.mock.patch.object(aiotus.upload, "__defaults__", defaults):
             with unittest.mock.patch(
                 "sys.argv", ["", "--debug", "upload", str(tusd.url) + "x", __file__]
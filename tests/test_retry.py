@@ -1,5 +1,7 @@
 """Test the 'upload()' function."""
 
+import asyncio
+import gc
 import io
 import logging
 
@@ -11,6 +13,25 @@ import yarl
 import aiotus
 
 
+@pytest.fixture
+def fake_concatenation(monkeypatch):
+    """Fake a server that supports the "concatenation" extension.
+
+    Returns a function that replaces the upload of the individual parts with
+    the given coroutine function.
+    """
+
+    async def configuration(*args):
+        return aiotus.core.ServerConfiguration(["1.0.0"], None, ["concatenation"])
+
+    monkeypatch.setattr(aiotus.retry, "_configuration", configuration)
+
+    def set_create_and_upload(create_and_upload):
+        monkeypatch.setattr(aiotus.retry, "_create_and_upload", create_and_upload)
+
+    return set_create_and_upload
+
+
 class TestRetry:
     async def test_upload_functional(self, tus_server, memory_file):
         """Test the normal functionality of the 'upload()' function."""
@@ -36,6 +57,11 @@ class TestRetry:
         assert "h2" in tus_server["post_headers"]
         assert tus_server["post_headers"]["h2"] == "v2"
 
+        # The upload is new, so its offset is not queried from the server.
+        assert tus_server["head_headers"] is None
+
+        await aiotus.metadata(location, headers=additional_headers)
+
         assert tus_server["head_headers"] is not None
         assert "h1" in tus_server["head_headers"]
         assert tus_server["head_headers"]["h1"] == "v1"
@@ -143,6 +169,85 @@ class TestRetry:
         assert location is None
         assert tus_server["data"] is not None  # Upload could be created.
 
+    async def test_upload_unexpected_error(self, monkeypatch, tus_server, memory_file):
+        """Only expected errors are turned into a failed upload."""
+
+        async def create_and_upload(*args):
+            raise TypeError("test error")
+
+        monkeypatch.setattr(aiotus.retry, "_create_and_upload", create_and_upload)
+
+        with pytest.raises(TypeError) as excinfo:
+            await aiotus.upload(tus_server["create_endpoint"], memory_file)
+
+        assert "test error" in str(excinfo.value)
+
+    async def test_upload_multiple_unexpected_error(
+        self, fake_concatenation, memory_file
+    ):
+        """Unexpected errors of a part are not turned into a failed upload."""
+
+        async def create_and_upload(*args):
+            raise TypeError("test error")
+
+        fake_concatenation(create_and_upload)
+
+        with pytest.raises(TypeError) as excinfo:
+            await aiotus.upload_multiple("http://localhost", [memory_file])
+
+        assert "test error" in str(excinfo.value)
+
+    async def test_invalid_chunksize(self, tus_server, memory_file):
+        """An invalid chunksize fails the upload before a request is made."""
+
+        location = await aiotus.upload(
+            tus_server["create_endpoint"], memory_file, chunksize="autp"
+        )
+        assert location is None
+
+        location = await aiotus.upload_multiple(
+            tus_server["create_endpoint"], [memory_file], chunksize="autp"
+        )
+        assert location is None
+
+        assert tus_server["retries_options"] == 0
+        assert tus_server["retries_create"] == 0
+
+    async def test_upload_timeout(self, monkeypatch, tus_server, memory_file):
+        """A timeout of the session is reported as a failed upload."""
+
+        async def create_and_upload(*args):
+            raise asyncio.TimeoutError()
+
+        monkeypatch.setattr(aiotus.retry, "_create_and_upload", create_and_upload)
+
+        location = await aiotus.upload(tus_server["create_endpoint"], memory_file)
+        assert location is None
+
+    async def test_creation_with_upload(self, tus_server, memory_file):
+        """Send the data along with the creation of the upload."""
+
+        config = aiotus.RetryConfiguration(creation_with_upload=True)
+
+        location = await aiotus.upload(
+            tus_server["create_endpoint"], memory_file, config=config
+        )
+
+        assert location is not None
+        assert tus_server["data"] == memory_file.getbuffer()
+        assert tus_server["post_headers"]["Upload-Length"] == "4"
+        assert tus_server["head_headers"] is None
+        assert tus_server["retries_upload"] == 0  # No PATCH request was made.
+
+        # Only the first chunk is sent along with the creation.
+        location = await aiotus.upload(
+            tus_server["create_endpoint"], memory_file, config=config, chunksize=3
+        )
+
+        assert location is not None
+        assert tus_server["data"] == memory_file.getbuffer()
+        assert tus_server["retries_upload"] == -1  # A single PATCH request was made.
+
     async def test_upload_relative_create(self, tus_server, memory_file):
         """Test what happens if the server returns a relative URL on creation."""
 
@@ -173,6 +278,66 @@ class TestRetry:
         md2 = await aiotus.metadata(str(location))
         assert md1 == md2
 
+    async def test_client_error_not_retried(self, tus_server):
+        """Client errors that won't go away are not retried."""
+
+        # The upload does not exist, so the server returns "404 Not Found".
+        md = await asyncio.wait_for(
+            aiotus.metadata(tus_server["upload_endpoint"]), timeout=10
+        )
+
+        assert md is None
+        assert tus_server["retries_head"] == -1  # Only a single request was made.
+
+    def test_is_retryable(self):
+        def response_error(status):
+            return aiohttp.ClientResponseError(None, (), status=status)
+
+        assert aiotus.retry._is_retryable(aiohttp.ClientConnectionError())
+        assert aiotus.retry._is_retryable(response_error(500))
+        assert aiotus.retry._is_retryable(response_error(429))
+        assert aiotus.retry._is_retryable(response_error(409))
+        assert not aiotus.retry._is_retryable(response_error(404))
+        assert not aiotus.retry._is_retryable(response_error(400))
+        assert not aiotus.retry._is_retryable(RuntimeError())
+
+    async def test_large_metadata(self, tus_server, memory_file):
+        """Read metadata that exceeds aiohttp's default header size limit."""
+
+        md1 = {"thumbnail": bytes(16 * 1024)}
+
+        # Put the metadata directly on the server, as the test server itself
+        # does not accept such large headers in requests.
+        tus_server["data"] = bytearray()
+        tus_server["metadata"] = aiotus.creation.encode_metadata(md1)
+
+        config = aiotus.RetryConfiguration(max_retry_period_seconds=0.001)
+        md2 = await aiotus.metadata(tus_server["upload_endpoint"], config=config)
+        assert md1 == md2
+
+    async def test_session_connection_limit(self):
+        """The connection limit allows the requested number of parallel uploads."""
+
+        config = aiotus.RetryConfiguration()
+
+        async with aiotus.retry._make_session(config) as session:
+            assert session.connector.limit == 100
+
+        async with aiotus.retry._make_session(config, 200) as session:
+            assert session.connector.limit == 200
+
+    async def test_session_timeout(self):
+        """Sessions created by aiotus use the configured timeouts."""
+
+        timeout = aiohttp.ClientTimeout(total=10)
+        config = aiotus.RetryConfiguration(timeout=timeout)
+
+        async with aiotus.retry._make_session(config) as session:
+            assert session.timeout == timeout
+
+        async with aiotus.retry._make_session(aiotus.RetryConfiguration()) as session:
+            assert session.timeout.total is None
+
     async def test_tusd(self, tusd, memory_file):
         """Test communication with the the tusd server."""
 
@@ -196,6 +361,72 @@ class TestRetry:
         md2 = await aiotus.metadata(location)
         assert md1 == md2
 
+    async def test_parallel_not_supported(self, tus_server, memory_file):
+        """Fall back to a sequential upload without the concatenation extension."""
+
+        location = await aiotus.upload(
+            tus_server["create_endpoint"],
+            memory_file,
+            chunksize=1,
+            parallel_uploads=2,
+        )
+
+        assert location is not None
+        assert tus_server["data"] == memory_file.getbuffer()
+
+    async def test_parallel_relative_location(
+        self, monkeypatch, fake_concatenation, memory_file
+    ):
+        """A relative final location is resolved, the metadata encoded once."""
+
+        encoded = []
+
+        async def create_and_upload(*args):
+            return yarl.URL("part")
+
+        async def create(session, url, file, metadata, ssl, headers):
+            assert headers["Upload-Metadata"] == "key dmFsdWU="
+            return yarl.URL("final")
+
+        def encode_metadata(metadata):
+            encoded.append(metadata)
+            return aiotus.creation.encode_metadata(metadata)
+
+        fake_concatenation(create_and_upload)
+        monkeypatch.setattr(aiotus.retry, "_encode_metadata", encode_metadata)
+        monkeypatch.setattr(aiotus.creation, "create", create)
+
+        location = await aiotus.upload(
+            "http://localhost/files",
+            memory_file,
+            {"key": b"value"},
+            chunksize=1,
+            parallel_uploads=2,
+        )
+
+        assert location == yarl.URL("http://localhost/files/final")
+        assert len(encoded) == 1
+
+    async def test_parallel_tusd(self, tusd, memory_file):
+        """Upload a single file in parallel parts to tusd."""
+
+        data = memory_file.getvalue()
+        md1 = {"key1": "value1".encode()}
+
+        location = await aiotus.upload(
+            tusd.url, memory_file, md1, chunksize=1, parallel_uploads=3
+        )
+        assert location is not None
+
+        async with aiohttp.ClientSession() as session:
+            async with session.get(location) as response:
+                body = await response.read()
+
+                assert body == data
+
+        md2 = await aiotus.metadata(location)
+        assert md1 == md2
+
 
 class TestUploadMultiple:
     """Test the 'aiotus.upload_multiple()' function."""
@@ -252,6 +483,36 @@ class TestUploadMultiple:
         )
         assert location is None
 
+    async def test_configuration_cached(self, tus_server, memory_file, monkeypatch):
+        """The server configuration is only queried once per session and headers."""
+
+        calls = []
+        configuration = aiotus.core.configuration
+
+        async def counting_configuration(*args, **kwargs):
+            calls.append(args)
+            return await configuration(*args, **kwargs)
+
+        monkeypatch.setattr(aiotus.core, "configuration", counting_configuration)
+
+        async with aiohttp.ClientSession() as s:
+            for _ in range(2):
+                location = await aiotus.upload_multiple(
+                    tus_server["create_endpoint"], [memory_file], client_session=s
+                )
+                assert location is None
+
+            # Other headers may change what the server reports.
+            location = await aiotus.upload_multiple(
+                tus_server["create_endpoint"],
+                [memory_file],
+                client_session=s,
+                headers={"Authorization": "Bearer token"},
+            )
+            assert location is None
+
+        assert len(calls) == 2
+
     async def test_part_failure(self, tusd):
         """Check the handling of a failure to upload a part."""
 
@@ -261,6 +522,132 @@ class TestUploadMultiple:
         location = await aiotus.upload_multiple(tusd.url, [file_a, file_b])
         assert location is None
 
+    async def test_part_failures_retrieved(self, monkeypatch, fake_concatenation):
+        """The errors of all failed parts are retrieved, not only the first one."""
+
+        async def create_and_upload(*args):
+            raise aiotus.ProtocolError("test error")
+
+        fake_concatenation(create_and_upload)
+
+        # Log records would keep the errors (and by that the tasks) alive.
+        monkeypatch.setattr(aiotus.retry.logger, "disabled", True)
+
+        # asyncio reports errors that were never retrieved to the event loop.
+        unhandled = []
+        loop = asyncio.get_running_loop()
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+
+        files = [io.BytesIO(b"\x00")] * 3
+        location = await aiotus.upload_multiple(
+            "http://localhost", files, parallel_uploads=3
+        )
+        assert location is None
+
+        gc.collect()
+        assert unhandled == []
+
+    async def test_part_failure_cancel(self, fake_concatenation, memory_file):
+        """The other parts are cancelled as soon as a part failed."""
+
+        cancelled = asyncio.Event()
+
+        async def create_and_upload(session, url, file, *args):
+            if file is memory_file:
+                raise aiotus.ProtocolError("test error")
+
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        fake_concatenation(create_and_upload)
+
+        location = await asyncio.wait_for(
+            aiotus.upload_multiple("http://localhost", [io.BytesIO(), memory_file]),
+            timeout=10,
+        )
+
+        assert location is None
+        assert cancelled.is_set()
+
+    async def test_parallel_uploads_limit(self, monkeypatch, fake_concatenation):
+        """Only the requested number of parts is uploaded at a time."""
+
+        running = 0
+        max_running = 0
+        final_headers = None
+
+        async def create_and_upload(session, url, file, *args):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+
+            # Let the parts finish in a different order than they were started.
+            index = int(file.getvalue())
+            await asyncio.sleep(0.01 * (index % 3))
+
+            running -= 1
+            return yarl.URL(f"http://localhost/files/{index}")
+
+        async def create(session, url, file, metadata, ssl, headers):
+            nonlocal final_headers
+            final_headers = headers
+            return yarl.URL("http://localhost/files/final")
+
+        fake_concatenation(create_and_upload)
+        monkeypatch.setattr(aiotus.creation, "create", create)
+
+        files = [io.BytesIO(str(i).encode()) for i in range(10)]
+        location = await aiotus.upload_multiple(
+            "http://localhost", iter(files), parallel_uploads=3
+        )
+
+        assert location is not None
+        assert max_running == 3
+        assert final_headers["Upload-Concat"] == "final;" + " ".join(
+            f"/files/{i}" for i in range(10)
+        )
+
+    async def test_open_functions(self, monkeypatch, fake_concatenation):
+        """Files given as functions are opened only for their upload."""
+
+        opened = []
+
+        async def create_and_upload(session, url, file, *args):
+            assert sum(not f.closed for f in opened) <= 2
+            await asyncio.sleep(0)
+            return yarl.URL(f"http://localhost/files/{len(opened)}")
+
+        async def create(*args, **kwargs):
+            return yarl.URL("http://localhost/files/final")
+
+        def open_file():
+            opened.append(io.BytesIO(b"\x00\x01"))
+            return opened[-1]
+
+        fake_concatenation(create_and_upload)
+        monkeypatch.setattr(aiotus.creation, "create", create)
+
+        location = await aiotus.upload_multiple(
+            "http://localhost", [open_file] * 5, parallel_uploads=2
+        )
+
+        assert location is not None
+        assert len(opened) == 5
+        assert all(f.closed for f in opened)
+
+    async def test_parallel_uploads_invalid(self, tus_server, memory_file):
+        """At least one upload has to run at a time."""
+
+        with pytest.raises(ValueError) as excinfo:
+            await aiotus.upload_multiple(
+                tus_server["create_endpoint"], [memory_file], parallel_uploads=0
+            )
+
+        assert "must be positive" in str(excinfo.value)
+
     async def test_timeout(self, tus_server, memory_file):
         """Test handling of the retry exception."""
 
@@ -278,11 +665,12 @@ class TestTenacity:
     """Test the log functions for tenacity."""
 
     async def test_exception_logging(self, caplog):
+        retry_logger = aiotus.retry._RetryLogger("test")
         rt = tenacity.AsyncRetrying(
             retry=tenacity.retry_if_exception_type(RuntimeError),
             stop=tenacity.stop_after_attempt(3),
-            before=aiotus.retry._make_log_before_function("test"),
-            before_sleep=aiotus.retry._make_log_before_sleep_function("test"),
+            before=retry_logger.before,
+            before_sleep=retry_logger.before_sleep,
         )
 
         with caplog.at_level(logging.INFO, logger="aiotus"):
@@ -299,11 +687,12 @@ class TestTenacity:
             assert lg[3][2] == "Trying test again, attempt number 3..."
 
     async def test_result_logging(self, caplog):
+        retry_logger = aiotus.retry._RetryLogger("test")
         rt = tenacity.AsyncRetrying(
             retry=tenacity.retry_if_result(lambda r: r is None),
             stop=tenacity.stop_after_attempt(2),
-            before=aiotus.retry._make_log_before_function("test"),
-            before_sleep=aiotus.retry._make_log_before_sleep_function("test"),
+            before=retry_logger.before,
+            before_sleep=retry_logger.before_sleep,
         )
 
         with caplog.at_level(logging.INFO, logger="aiotus"):
@@ -317,6 +706,66 @@ class TestTenacity:
             assert lg[0][2] == "Test failed, retrying in 0 second(s): None"
             assert lg[1][2] == "Trying test again, attempt number 2..."
 
+    async def test_disabled_logging(self, caplog):
+        retry_logger = aiotus.retry._RetryLogger("test")
+        rt = tenacity.AsyncRetrying(
+            retry=tenacity.retry_if_exception_type(RuntimeError),
+            stop=tenacity.stop_after_attempt(3),
+            before=retry_logger.before,
+            before_sleep=retry_logger.before_sleep,
+        )
+
+        with caplog.at_level(logging.ERROR, logger="aiotus"):
+            with pytest.raises(tenacity.RetryError):
+                async for attempt in rt:
+                    with attempt:
+                        await TestTenacity.raise_runtime_error()
+
+            assert caplog.record_tuples == []
+
+    def test_make_retrying(self):
+        config = aiotus.RetryConfiguration(3, 0.001)
+
+        rt1 = aiotus.retry._make_retrying("test", config)
+        rt2 = aiotus.retry._make_retrying("test", config)
+        assert rt1 is not rt2
+        assert rt1.stop is rt2.stop
+        assert rt1.wait is rt2.wait
+
+        config.retry_attempts = 4
+        rt3 = aiotus.retry._make_retrying("test", config)
+        assert rt3.stop is not rt1.stop
+        assert rt3.stop.max_attempt_number == 4
+
+    async def test_sleep_does_not_block(self):
+        """Other coroutines keep running while waiting for the next attempt."""
+
+        config = aiotus.RetryConfiguration(3)
+        rt = aiotus.retry._make_retrying("test", config)
+        assert rt.sleep is asyncio.sleep
+
+        # Wait a fixed time, the random backoff could be arbitrarily short.
+        rt = rt.copy(wait=tenacity.wait_fixed(0.05))
+
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        try:
+            with pytest.raises(tenacity.RetryError):
+                async for attempt in rt:
+                    with attempt:
+                        raise aiohttp.ClientConnectionError()
+        finally:
+            ticker.cancel()
+
+        assert ticks > 1
+
     @staticmethod
     async def raise_runtime_error():
         raise RuntimeError("test error")